@@ -5,36 +5,88 @@ Google OAuth 2.0 login, callback, session cookie, and current-user dependency.
 - Callback validates state, exchanges code for tokens, stores encrypted tokens
   on User, sets JWT in HttpOnly cookie, redirects to frontend (no token in URL).
 - /me returns current user when session cookie is valid.
-- /logout clears the session cookie.
+- /logout clears the session cookie and drops it from the session cache.
 - get_current_user dependency reads JWT from cookie and returns User (for drive and others).
-- get_valid_access_token(user, db) returns a valid access_token, refreshing if needed.
+- get_current_user_id / get_session_user dependencies answer from the JWT claims
+  (or the session cache) with no DB lookup.
+- get_current_user_lean loads only the profile/root-folder columns (no token blobs).
+- get_valid_access_token(user, db, http) returns a valid access_token, refreshing if needed
+  (one refresh per user at a time; concurrent callers wait and reuse the result).
+- Google calls go through the shared httpx.AsyncClient created in main's lifespan
+  (app.state.http), so handlers don't block while waiting on Google.
 """
+import asyncio
+import random
 import secrets
 from datetime import datetime, timedelta, UTC
+from typing import NamedTuple
+from urllib.parse import urlencode
 
-import requests
+import httpx
+from cachetools import TTLCache
 from fastapi import APIRouter, Depends, HTTPException, Request
 from fastapi.responses import RedirectResponse, Response
-from sqlalchemy.orm import Session
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from config import (
     FRONTEND_URL,
     GOOGLE_CLIENT_ID,
     GOOGLE_CLIENT_SECRET,
     GOOGLE_REDIRECT_URI,
+    GOOGLE_TOKEN_TIMEOUT,
+    GOOGLE_USERINFO_TIMEOUT,
     JWT_COOKIE_MAX_AGE,
     JWT_COOKIE_NAME,
     OAUTH_STATE_COOKIE_NAME,
     OAUTH_STATE_MAX_AGE,
     SECURE_COOKIES,
 )
-from crypto import decrypt, encrypt
-from database import get_db
+from crypto import decrypt, encrypt, forget_decrypted
+from database import dialect_insert, get_db
 from models import User
-from security import create_jwt, decode_jwt
+from security import (
+    SessionUser,
+    cache_session,
+    create_jwt,
+    decode_jwt,
+    get_cached_session,
+    invalidate_session,
+    unverified_claims,
+)
 
 router = APIRouter(prefix="/auth")
 
+GOOGLE_TOKEN_URL = "https://oauth2.googleapis.com/token"
+# Token endpoint retry budget: transient 5xx / connection resets are retried
+_TOKEN_RETRIES = 3
+_TOKEN_RETRY_STATUSES = {500, 502, 503, 504}
+_TOKEN_TIMEOUT = httpx.Timeout(GOOGLE_TOKEN_TIMEOUT[1], connect=GOOGLE_TOKEN_TIMEOUT[0])
+_USERINFO_TIMEOUT = httpx.Timeout(GOOGLE_USERINFO_TIMEOUT[1], connect=GOOGLE_USERINFO_TIMEOUT[0])
+
+# Consent URL is constant apart from the per-request CSRF state
+_LOGIN_URL_TEMPLATE = (
+    "https://accounts.google.com/o/oauth2/v2/auth?"
+    + urlencode({
+        "client_id": GOOGLE_CLIENT_ID,
+        "redirect_uri": GOOGLE_REDIRECT_URI,
+        "response_type": "code",
+        "scope": "openid email profile https://www.googleapis.com/auth/drive.readonly",
+        "access_type": "offline",
+        "prompt": "consent",
+    })
+    + "&state={state}"
+)
+
+# Per-user locks so concurrent requests with an expired token refresh it only once.
+# Lookup/insert has no await, so the dict needs no extra mutex on the event loop.
+_refresh_locks: dict[str, asyncio.Lock] = {}
+_MAX_REFRESH_LOCKS = 1024
+
+# user id -> (plaintext access token, fresh_until); only touched on the event loop.
+# Hot Drive traffic returns from here without a decrypt or expiry arithmetic.
+_access_token_cache: TTLCache = TTLCache(maxsize=10_000, ttl=300)
+
 # Cookie flags: HttpOnly (no JS access), SameSite=Lax (CSRF mitigation), Secure in production is set per-response
 def _cookie_kwargs(secure: bool = False) -> dict:
     return {
@@ -45,60 +97,224 @@ def _cookie_kwargs(secure: bool = False) -> dict:
     }
 
 
-def get_current_user(
-    request: Request,
-    db: Session = Depends(get_db),
-) -> User:
+def _refresh_lock(user_id: str) -> asyncio.Lock:
+    """Return the refresh lock for user_id; drop idle locks once the dict grows large."""
+    lock = _refresh_locks.get(user_id)
+    if lock is None:
+        if len(_refresh_locks) >= _MAX_REFRESH_LOCKS:
+            for uid in [uid for uid, l in _refresh_locks.items() if not l.locked()]:
+                del _refresh_locks[uid]
+        lock = _refresh_locks[user_id] = asyncio.Lock()
+    return lock
+
+
+def _as_utc(dt: datetime) -> datetime:
+    """Return dt as an aware datetime; SQLite returns naive ones, and stored values are always UTC."""
+    if dt.tzinfo is None:
+        return dt.replace(tzinfo=UTC)
+    return dt
+
+
+def _needs_refresh(expires_at: datetime | None, now: datetime) -> bool:
+    """True if there is no expiry info, or the token is expired or expiring within 5 minutes."""
+    if not expires_at:
+        return True
+    return now >= _as_utc(expires_at) - timedelta(minutes=5)
+
+
+def _cache_access_token(user: User, access_token: str) -> str:
+    """Cache access_token for user until 5 minutes before it expires; returns it."""
+    expires_at = user.access_token_expires_at
+    if expires_at:
+        _access_token_cache[user.id] = (access_token, _as_utc(expires_at) - timedelta(minutes=5))
+    return access_token
+
+
+async def _post_token(http: httpx.AsyncClient, data: dict) -> dict:
     """
-    FastAPI dependency: read JWT from session cookie, decode it, load User.
-    Raises 401 if cookie missing or JWT invalid/expired or user not found.
+    POST a grant to Google's token endpoint and return the JSON body. Connection
+    errors and 5xx are retried with jittered exponential backoff; once the budget
+    is spent, raises 503 with Retry-After instead of invalidating the session.
     """
+    for attempt in range(_TOKEN_RETRIES + 1):
+        try:
+            resp = await http.post(
+                GOOGLE_TOKEN_URL,
+                data={"client_id": GOOGLE_CLIENT_ID, "client_secret": GOOGLE_CLIENT_SECRET, **data},
+                headers={"Content-Type": "application/x-www-form-urlencoded"},
+                timeout=_TOKEN_TIMEOUT,
+            )
+        except httpx.TransportError:
+            resp = None
+        if resp is not None and resp.status_code not in _TOKEN_RETRY_STATUSES:
+            return resp.json()
+        if attempt < _TOKEN_RETRIES:
+            await asyncio.sleep(0.3 * 2**attempt + random.uniform(0, 0.2))
+    raise HTTPException(
+        status_code=503,
+        detail="Google sign-in is temporarily unavailable; please retry",
+        headers={"Retry-After": "5"},
+    )
+
+
+def get_http_client(request: Request) -> httpx.AsyncClient:
+    """FastAPI dependency: the shared async HTTP client created at app startup."""
+    return request.app.state.http
+
+
+def _session_token(request: Request) -> str:
+    """Return the session JWT from the cookie; 401 if missing."""
     token = request.cookies.get(JWT_COOKIE_NAME)
     if not token:
         raise HTTPException(status_code=401, detail="Not authenticated")
+    return token
+
+
+def _session_claims(token: str) -> dict:
+    """Verify the session JWT and return its claims; 401 if invalid/expired or missing sub."""
     try:
         payload = decode_jwt(token)
     except Exception:
         raise HTTPException(status_code=401, detail="Invalid or expired session")
-    user_id = payload.get("sub")
-    if not user_id:
+    if not payload.get("sub"):
         raise HTTPException(status_code=401, detail="Invalid session")
-    user = db.get(User, user_id)
+    return payload
+
+
+def _cache_claims(token: str, payload: dict) -> SessionUser | None:
+    """Cache a SessionUser built from the JWT's profile claims; None if the token has none."""
+    if not payload.get("email"):
+        return None
+    session = SessionUser(id=payload["sub"], email=payload["email"], name=payload.get("name"))
+    cache_session(token, session, payload["exp"])
+    return session
+
+
+def get_current_user_id(request: Request) -> str:
+    """
+    FastAPI dependency: user id (Google sub) from the session cookie, without
+    loading the User row. Use when the endpoint needs nothing beyond the id.
+    """
+    token = _session_token(request)
+    session = get_cached_session(token)
+    if session is None:
+        payload = _session_claims(token)
+        session = _cache_claims(token, payload)
+        if session is None:
+            return payload["sub"]
+    return session.id
+
+
+async def get_session_user(
+    request: Request,
+    db: AsyncSession = Depends(get_db),
+) -> SessionUser:
+    """
+    FastAPI dependency for read-only profile access: the cached session snapshot,
+    else the profile claims of the JWT. Only tokens minted without those claims
+    fall back to loading the User row.
+    """
+    token = _session_token(request)
+    session = get_cached_session(token)
+    if session is not None:
+        return session
+    payload = _session_claims(token)
+    session = _cache_claims(token, payload)
+    if session is None:
+        user = await db.get(User, payload["sub"])
+        if not user:
+            raise HTTPException(status_code=401, detail="User not found")
+        session = SessionUser(id=user.id, email=user.email, name=user.name)
+        cache_session(token, session, payload["exp"])
+    return session
+
+
+async def get_current_user(
+    user_id: str = Depends(get_current_user_id),
+    db: AsyncSession = Depends(get_db),
+) -> User:
+    """
+    FastAPI dependency: read JWT from session cookie (via get_current_user_id), load User.
+    Use for endpoints that read or mutate User columns (root folder, tokens).
+    Raises 401 if cookie missing or JWT invalid/expired or user not found.
+    """
+    user = await db.get(User, user_id)
     if not user:
         raise HTTPException(status_code=401, detail="User not found")
     return user
 
 
-def get_valid_access_token(user: User, db: Session, *, force_refresh: bool = False) -> str:
+class LeanUser(NamedTuple):
+    """User columns needed by read-only endpoints; excludes the encrypted token blobs."""
+    id: str
+    email: str
+    name: str | None
+    drive_root_folder_id: str | None
+
+
+async def get_current_user_lean(
+    user_id: str = Depends(get_current_user_id),
+    db: AsyncSession = Depends(get_db),
+) -> LeanUser:
+    """
+    FastAPI dependency like get_current_user, but selects only LeanUser columns.
+    Use for read-only endpoints that never call get_valid_access_token.
+    """
+    result = await db.execute(
+        select(User.id, User.email, User.name, User.drive_root_folder_id).where(User.id == user_id)
+    )
+    row = result.one_or_none()
+    if row is None:
+        raise HTTPException(status_code=401, detail="User not found")
+    return LeanUser(*row)
+
+
+async def get_valid_access_token(
+    user: User,
+    db: AsyncSession,
+    http: httpx.AsyncClient,
+    *,
+    force_refresh: bool = False,
+) -> str:
     """
     Return a valid Google access token for this user, refreshing if expired or
     expiring within 5 minutes (or always when force_refresh=True, for retry after 401).
     Updates user.encrypted_* and access_token_expires_at in DB when refresh is performed.
+    Refreshes are serialized per user: waiters re-read the row and reuse a token
+    another request just obtained instead of refreshing again. Valid tokens are
+    cached in memory per user; force_refresh evicts the cached entry.
     Raises 401 if refresh token is missing or refresh fails.
     """
-    access_token = decrypt(user.encrypted_access_token)
-    expires_at = user.access_token_expires_at
     now = datetime.now(UTC)
-    # Refresh if force_refresh, or no expiry info, or expired, or expiring soon
-    if force_refresh or not expires_at or now >= expires_at - timedelta(minutes=5):
+    if force_refresh:
+        _access_token_cache.pop(user.id, None)
+    else:
+        cached = _access_token_cache.get(user.id)
+        if cached is not None and now < cached[1]:
+            return cached[0]
+        if not _needs_refresh(user.access_token_expires_at, now):
+            return _cache_access_token(user, decrypt(user.encrypted_access_token))
+
+    stale_token = user.encrypted_access_token
+    async with _refresh_lock(user.id):
+        # Another request may have refreshed while we waited; reuse its token
+        await db.refresh(user)
+        now = datetime.now(UTC)
+        if user.encrypted_access_token != stale_token and not _needs_refresh(
+            user.access_token_expires_at, now
+        ):
+            return _cache_access_token(user, decrypt(user.encrypted_access_token))
+
         refresh_token = decrypt(user.encrypted_refresh_token)
         if not refresh_token:
             raise HTTPException(
                 status_code=401,
                 detail="Session expired; please log in again to grant Drive access",
             )
-        resp = requests.post(
-            "https://oauth2.googleapis.com/token",
-            data={
-                "client_id": GOOGLE_CLIENT_ID,
-                "client_secret": GOOGLE_CLIENT_SECRET,
-                "refresh_token": refresh_token,
-                "grant_type": "refresh_token",
-            },
-            headers={"Content-Type": "application/x-www-form-urlencoded"},
-            timeout=(5, 30),
+        data = await _post_token(
+            http,
+            {"refresh_token": refresh_token, "grant_type": "refresh_token"},
         )
-        data = resp.json()
         if "error" in data:
             raise HTTPException(
                 status_code=401,
@@ -106,32 +322,29 @@ def get_valid_access_token(user: User, db: Session, *, force_refresh: bool = Fal
             )
         access_token = data["access_token"]
         expires_in = data.get("expires_in", 3600)
-        user.encrypted_access_token = encrypt(access_token)
-        user.access_token_expires_at = now + timedelta(seconds=expires_in)
+        values = {
+            "encrypted_access_token": encrypt(access_token),
+            "access_token_expires_at": now + timedelta(seconds=expires_in),
+        }
+        forget_decrypted(user.encrypted_access_token)
         if data.get("refresh_token"):
-            user.encrypted_refresh_token = encrypt(data["refresh_token"])
-        db.commit()
-    return access_token
+            forget_decrypted(user.encrypted_refresh_token)
+            values["encrypted_refresh_token"] = encrypt(data["refresh_token"])
+        # One UPDATE of just the token columns; also syncs the in-session user
+        await db.execute(update(User).where(User.id == user.id).values(**values))
+        await db.commit()
+    return _cache_access_token(user, access_token)
 
 
 @router.get("/google/login")
-def google_login(response: Response):
+async def google_login(response: Response):
     """
     Redirect to Google OAuth consent. Sets a short-lived cookie with a random
     state value and includes the same state in the redirect URL so the callback
     can verify the request was not forged (CSRF protection).
     """
     state = secrets.token_urlsafe(32)
-    url = (
-        "https://accounts.google.com/o/oauth2/v2/auth"
-        f"?client_id={GOOGLE_CLIENT_ID}"
-        f"&redirect_uri={GOOGLE_REDIRECT_URI}"
-        "&response_type=code"
-        "&scope=openid email profile https://www.googleapis.com/auth/drive.readonly"
-        "&access_type=offline"
-        "&prompt=consent"
-        f"&state={state}"
-    )
+    url = _LOGIN_URL_TEMPLATE.format(state=state)
     redirect = RedirectResponse(url=url)
     redirect.set_cookie(
         OAUTH_STATE_COOKIE_NAME,
@@ -143,16 +356,17 @@ def google_login(response: Response):
 
 
 @router.get("/google/callback")
-def google_callback(
+async def google_callback(
     request: Request,
     code: str | None = None,
     state: str | None = None,
     error: str | None = None,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
+    http: httpx.AsyncClient = Depends(get_http_client),
 ):
     """
     Handle redirect from Google. Validates state cookie (CSRF), exchanges code
-    for tokens, creates/updates User with encrypted tokens, sets session cookie,
+    for tokens, upserts User with encrypted tokens, sets session cookie,
     redirects to frontend success page (no JWT in URL).
     """
     if error:
@@ -164,19 +378,14 @@ def google_callback(
     if not state_cookie or not secrets.compare_digest(state, state_cookie):
         raise HTTPException(status_code=400, detail="Invalid or expired state; please try logging in again")
 
-    token_res = requests.post(
-        "https://oauth2.googleapis.com/token",
-        data={
-            "client_id": GOOGLE_CLIENT_ID,
-            "client_secret": GOOGLE_CLIENT_SECRET,
+    token_data = await _post_token(
+        http,
+        {
             "code": code,
             "grant_type": "authorization_code",
             "redirect_uri": GOOGLE_REDIRECT_URI,
         },
-        headers={"Content-Type": "application/x-www-form-urlencoded"},
-        timeout=(5, 30),
     )
-    token_data = token_res.json()
     if "error" in token_data:
         raise HTTPException(
             status_code=400,
@@ -193,40 +402,61 @@ def google_callback(
     expires_in = token_data.get("expires_in", 3600)
     expires_at = datetime.now(UTC) + timedelta(seconds=expires_in)
 
-    userinfo_res = requests.get(
-        "https://openidconnect.googleapis.com/v1/userinfo",
-        headers={"Authorization": f"Bearer {access_token}"},
-        timeout=(5, 30),
-    )
-    userinfo_res.raise_for_status()
-    userinfo = userinfo_res.json()
+    # The id_token came straight from Google's token endpoint over TLS and carries
+    # sub/email/name; only call userinfo if it is missing or unusable
+    userinfo = {}
+    if token_data.get("id_token"):
+        try:
+            userinfo = unverified_claims(token_data["id_token"])
+        except Exception:
+            userinfo = {}
+        if userinfo.get("aud") != GOOGLE_CLIENT_ID:
+            userinfo = {}
+    if not userinfo.get("sub") or not userinfo.get("email"):
+        userinfo_res = await http.get(
+            "https://openidconnect.googleapis.com/v1/userinfo",
+            headers={"Authorization": f"Bearer {access_token}"},
+            timeout=_USERINFO_TIMEOUT,
+        )
+        userinfo_res.raise_for_status()
+        userinfo = userinfo_res.json()
 
     user_id = userinfo.get("sub")
     email = userinfo.get("email")
     if not user_id or not email:
         raise HTTPException(
             status_code=400,
-            detail="Google userinfo missing sub or email",
-        )
-    user = db.get(User, user_id)
-    if not user:
-        user = User(
-            id=user_id,
-            email=email,
-            name=userinfo.get("name"),
-            encrypted_access_token=encrypt(access_token),
-            encrypted_refresh_token=encrypt(refresh_token) if refresh_token else None,
-            access_token_expires_at=expires_at,
+            detail="Google profile missing sub or email",
         )
-        db.add(user)
-    else:
-        user.encrypted_access_token = encrypt(access_token)
+    name = userinfo.get("name")
+    # Single INSERT .. ON CONFLICT: create the user or refresh profile and tokens
+    values = {
+        "email": email,
+        "name": name,
+        "encrypted_access_token": encrypt(access_token),
+        "access_token_expires_at": expires_at,
+    }
+    if refresh_token:
+        values["encrypted_refresh_token"] = encrypt(refresh_token)
+    # Old ciphertexts of a returning user, so their plaintexts can be dropped
+    # from the decrypt cache once replaced (one primary-key lookup)
+    old_tokens = (await db.execute(
+        select(User.encrypted_access_token, User.encrypted_refresh_token)
+        .where(User.id == user_id)
+    )).first()
+    await db.execute(
+        dialect_insert(User)
+        .values(id=user_id, **values)
+        .on_conflict_do_update(index_elements=[User.id], set_=values)
+    )
+    await db.commit()
+    _access_token_cache.pop(user_id, None)
+    if old_tokens:
+        forget_decrypted(old_tokens.encrypted_access_token)
         if refresh_token:
-            user.encrypted_refresh_token = encrypt(refresh_token)
-        user.access_token_expires_at = expires_at
-    db.commit()
+            forget_decrypted(old_tokens.encrypted_refresh_token)
 
-    jwt_token = create_jwt(user.id)
+    jwt_token = create_jwt(user_id, email, name)
     redirect = RedirectResponse(url=f"{FRONTEND_URL}/login/success")
     # Set session cookie so frontend can call /auth/me and other APIs with credentials
     redirect.set_cookie(
@@ -241,16 +471,19 @@ def google_callback(
 
 
 @router.get("/me")
-def me(user: User = Depends(get_current_user)):
+def me(user: SessionUser = Depends(get_session_user)):
     """Return current user profile (id, email, name). Requires valid session cookie."""
     return {"id": user.id, "email": user.email, "name": user.name}
 
 
 @router.post("/logout")
-def logout(response: Response):
+def logout(request: Request, response: Response):
     """
     Clear the session cookie so the client is logged out. Frontend should
     redirect to login after calling this.
     """
+    token = request.cookies.get(JWT_COOKIE_NAME)
+    if token:
+        invalidate_session(token)
     response.delete_cookie(JWT_COOKIE_NAME, path="/")
     return {"ok": True}
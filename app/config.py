@@ -50,28 +50,52 @@ except ValueError:
     MAX_ELIGIBLE_FILE_SIZE_BYTES = 52428800
 
 # Recursive Drive scan limits (prevent unbounded scans, quota abuse)
-def _int_env(key: str, default: int) -> int:
+def _int_env(key: str, default: int, minimum: int = 1) -> int:
     try:
-        return max(1, int(os.getenv(key, str(default))))
+        return max(minimum, int(os.getenv(key, str(default))))
     except ValueError:
         return default
 
 MAX_SCAN_FOLDERS = _int_env("MAX_SCAN_FOLDERS", 1000)
 MAX_SCAN_FILES = _int_env("MAX_SCAN_FILES", 5000)
 
+# Recursive Drive scan: folders listed concurrently
+DRIVE_SCAN_WORKERS = _int_env("DRIVE_SCAN_WORKERS", 8)
+
 # Download: max files per request
 MAX_DOWNLOAD_FILES = _int_env("MAX_DOWNLOAD_FILES", 20)
 
+# Download: parallel file downloads per request (bounded by the number of files)
+DRIVE_DOWNLOAD_WORKERS = _int_env("DRIVE_DOWNLOAD_WORKERS", 8)
+
 # Request timeouts (connect, read) in seconds
 DRIVE_REQUEST_TIMEOUT = (5, 60)  # connect 5s, read 60s
 DRIVE_DOWNLOAD_TIMEOUT = (5, 120)  # streaming download: 120s read
 
+# Streaming download chunk size in bytes (fewer Python iterations / write calls per MiB)
+DRIVE_DOWNLOAD_CHUNK_SIZE = _int_env("DRIVE_DOWNLOAD_CHUNK_SIZE", 262144)
+
+# Google OAuth endpoints return tiny JSON; fail fast (connect, read) in seconds
+GOOGLE_TOKEN_TIMEOUT = (
+    _int_env("GOOGLE_TOKEN_CONNECT_TIMEOUT", 2),
+    _int_env("GOOGLE_TOKEN_READ_TIMEOUT", 4),
+)
+GOOGLE_USERINFO_TIMEOUT = (
+    _int_env("GOOGLE_USERINFO_CONNECT_TIMEOUT", 2),
+    _int_env("GOOGLE_USERINFO_READ_TIMEOUT", 8),
+)
+
 # Secure cookie flag (set True in production over HTTPS)
 SECURE_COOKIES = os.getenv("SECURE_COOKIES", "false").lower() in ("1", "true", "yes")
 
 # Database URL (SQLite default; use Postgres URL in production)
 DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./app.db")
 
+# Connection pool for server databases (ignored for SQLite)
+DB_POOL_SIZE = _int_env("DB_POOL_SIZE", 20)
+DB_MAX_OVERFLOW = _int_env("DB_MAX_OVERFLOW", 40, minimum=0)  # 0 = strictly bounded pool
+DB_POOL_RECYCLE = _int_env("DB_POOL_RECYCLE", 1800)  # seconds
+
 # Skip create_all at startup (set in production when using Alembic migrations)
 SKIP_DB_INIT = os.getenv("SKIP_DB_INIT", "false").lower() in ("1", "true", "yes")
 
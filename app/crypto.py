@@ -3,9 +3,14 @@ Encryption of OAuth tokens at rest using Fernet (symmetric, from cryptography).
 
 Tokens are encrypted before being stored in the User table and decrypted only
 when needed for Google API calls. Handles None for optional refresh_token.
+
+Decrypted values are memoized by ciphertext for a few minutes so the hot auth
+path does not re-run Fernet (HMAC + AES) for a token that has not changed.
 """
 import os
+import threading
 
+from cachetools import TTLCache
 from cryptography.fernet import Fernet
 
 FERNET_KEY = os.environ.get("TOKEN_ENCRYPTION_KEY")
@@ -13,16 +18,45 @@ if not FERNET_KEY:
     raise RuntimeError("TOKEN_ENCRYPTION_KEY environment variable is required")
 fernet = Fernet(FERNET_KEY.encode() if isinstance(FERNET_KEY, str) else FERNET_KEY)
 
+# ciphertext -> plaintext; cachetools is not thread-safe
+_decrypt_cache: TTLCache = TTLCache(maxsize=4096, ttl=300)
+_decrypt_cache_lock = threading.Lock()
+
+
+def encrypt_bytes(value: bytes) -> str:
+    """Encrypt raw bytes; returns the ciphertext as str for storage."""
+    return fernet.encrypt(value).decode()
+
+
+def decrypt_bytes(value: str) -> bytes:
+    """Decrypt a stored ciphertext to raw bytes (uncached; no str round-trip)."""
+    return fernet.decrypt(value.encode())
+
 
 def encrypt(value: str) -> str:
     """Encrypt a string (e.g. access_token or refresh_token) for storage."""
-    return fernet.encrypt(value.encode()).decode()
+    return encrypt_bytes(value.encode())
 
 
 def decrypt(value: str | None) -> str | None:
     """
     Decrypt a stored token. Returns None if value is None (e.g. optional refresh_token).
+    Results are cached by ciphertext (see forget_decrypted).
     """
     if value is None:
         return None
-    return fernet.decrypt(value.encode()).decode()
+    with _decrypt_cache_lock:
+        plaintext = _decrypt_cache.get(value)
+    if plaintext is None:
+        plaintext = decrypt_bytes(value).decode()
+        with _decrypt_cache_lock:
+            _decrypt_cache[value] = plaintext
+    return plaintext
+
+
+def forget_decrypted(value: str | None) -> None:
+    """Evict a ciphertext from the decrypt cache (call when a stored token is replaced)."""
+    if value is None:
+        return
+    with _decrypt_cache_lock:
+        _decrypt_cache.pop(value, None)
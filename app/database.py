@@ -1,28 +1,82 @@
 """
 Database engine and session. Supports SQLite (dev) and Postgres via DATABASE_URL.
 
-get_db is the single dependency for DB access; used by auth and drive routers.
+The engine is async: DATABASE_URL keeps its plain sync form (sqlite://,
+postgresql://) and is mapped to the aiosqlite / asyncpg drivers here, so sync
+tooling such as Alembic can keep using DATABASE_URL with create_engine.
+get_db is the single dependency for DB access (yields an AsyncSession); used by
+auth and drive routers.
 """
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker, declarative_base
+from sqlalchemy import event, text
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.orm import declarative_base
+from sqlalchemy.pool import StaticPool
+
+from config import DATABASE_URL, DB_MAX_OVERFLOW, DB_POOL_RECYCLE, DB_POOL_SIZE
+
+
+def _async_url(url: str) -> str:
+    """Map a sync database URL to its async driver; URLs naming a driver are kept."""
+    for sync_prefix, async_prefix in (
+        ("sqlite://", "sqlite+aiosqlite://"),
+        ("postgresql://", "postgresql+asyncpg://"),
+    ):
+        if url.startswith(sync_prefix):
+            return async_prefix + url[len(sync_prefix):]
+    return url
 
-from config import DATABASE_URL
 
-# SQLite needs check_same_thread=False for FastAPI; Postgres does not
-_connect_args = {}
 if DATABASE_URL.startswith("sqlite"):
-    _connect_args["check_same_thread"] = False
+    # File databases keep SQLAlchemy's default queue pool; an in-memory DB
+    # must share one connection.
+    _engine_kwargs = {}
+    if ":memory:" in DATABASE_URL or DATABASE_URL in ("sqlite://", "sqlite:///"):
+        _engine_kwargs["poolclass"] = StaticPool
+else:
+    _engine_kwargs = {
+        "pool_size": DB_POOL_SIZE,
+        "max_overflow": DB_MAX_OVERFLOW,
+        "pool_pre_ping": True,
+        "pool_recycle": DB_POOL_RECYCLE,
+    }
+
+engine = create_async_engine(_async_url(DATABASE_URL), **_engine_kwargs)
+
 
-engine = create_engine(DATABASE_URL, connect_args=_connect_args)
-SessionLocal = sessionmaker(bind=engine)
+if engine.dialect.name == "sqlite":
+    @event.listens_for(engine.sync_engine, "connect")
+    def _sqlite_pragmas(dbapi_connection, connection_record):
+        """WAL lets readers run alongside the writer; busy_timeout waits instead of failing on lock."""
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute("PRAGMA synchronous=NORMAL")
+        cursor.execute("PRAGMA busy_timeout=5000")
+        cursor.execute("PRAGMA temp_store=MEMORY")
+        cursor.close()
+
+# expire_on_commit=False: attributes stay loaded after commit (no implicit async lazy loads)
+SessionLocal = async_sessionmaker(engine, expire_on_commit=False)
+
+# Dialect INSERT supporting on_conflict_do_update (upserts), picked once at startup
+if engine.dialect.name == "postgresql":
+    from sqlalchemy.dialects.postgresql import insert as dialect_insert
+else:
+    from sqlalchemy.dialects.sqlite import insert as dialect_insert
 
 Base = declarative_base()
 
 
-def get_db():
-    """FastAPI dependency: yields a DB session and closes it after the request."""
-    db = SessionLocal()
-    try:
+async def init_db() -> None:
+    """
+    Create missing tables (dev / no Alembic). Also drops ix_users_id, a duplicate
+    of the users primary-key index that older schemas created.
+    """
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+        await conn.execute(text("DROP INDEX IF EXISTS ix_users_id"))
+
+
+async def get_db():
+    """FastAPI dependency: yields an async DB session and closes it after the request."""
+    async with SessionLocal() as db:
         yield db
-    finally:
-        db.close()
@@ -4,25 +4,35 @@ Drive router: HTTP endpoints for root folder, file list, download.
 Delegates business logic to services.drive_service. All Drive API access
 uses get_valid_access_token (handles refresh). On 401, retries once after
 forcing refresh. Enforces limits and validates inputs.
+
+Handlers are async: token refresh and Drive metadata calls (folder check,
+recursive scan) await the shared httpx client; the blocking downloads run in
+the threadpool via run_in_threadpool.
 """
-import requests
-from requests.exceptions import HTTPError as RequestsHTTPError
+import httpx
 from fastapi import APIRouter, Depends, HTTPException
+from fastapi.concurrency import run_in_threadpool
 from pydantic import BaseModel, Field
-from sqlalchemy.orm import Session
-
-from auth import get_current_user, get_valid_access_token
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from auth import (
+    LeanUser,
+    get_current_user,
+    get_current_user_lean,
+    get_http_client,
+    get_valid_access_token,
+)
 from config import MAX_DOWNLOAD_FILES, MAX_ELIGIBLE_FILE_SIZE_BYTES
 from database import get_db
 from models import User
 from services.drive_service import (
+    EligibleFile,
     ScanLimitExceeded,
     collect_eligible_recursive,
-    download_file_with_size_limit,
+    download_many,
     safe_filename,
     user_storage_path,
     validate_folder,
-    resolve_download_path,
 )
 
 router = APIRouter(prefix="/drive")
@@ -45,10 +55,11 @@ class DownloadBody(BaseModel):
 
 
 @router.post("/root-folder")
-def set_root_folder(
+async def set_root_folder(
     body: SetRootFolderBody,
     user: User = Depends(get_current_user),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
+    http: httpx.AsyncClient = Depends(get_http_client),
 ):
     """
     Set the root folder in Google Drive from which the app will discover books.
@@ -58,13 +69,13 @@ def set_root_folder(
     if not folder_id:
         raise HTTPException(status_code=400, detail="folder_id cannot be empty")
 
-    access_token = get_valid_access_token(user, db)
+    access_token = await get_valid_access_token(user, db, http)
     try:
-        valid = validate_folder(access_token, folder_id)
-    except RequestsHTTPError as e:
-        if getattr(e, "response", None) is not None and e.response.status_code == 401:
-            access_token = get_valid_access_token(user, db, force_refresh=True)
-            valid = validate_folder(access_token, folder_id)
+        valid = await validate_folder(http, access_token, folder_id)
+    except httpx.HTTPStatusError as e:
+        if e.response.status_code == 401:
+            access_token = await get_valid_access_token(user, db, http, force_refresh=True)
+            valid = await validate_folder(http, access_token, folder_id)
         else:
             raise
 
@@ -74,20 +85,33 @@ def set_root_folder(
             detail="Folder not found or not a folder; check the ID and your Drive access",
         )
 
-    user.drive_root_folder_id = folder_id
-    db.commit()
+    # Re-setting the same folder is a no-op; skip the write transaction
+    if user.drive_root_folder_id != folder_id:
+        user.drive_root_folder_id = folder_id
+        await db.commit()
     return {"ok": True, "folder_id": user.drive_root_folder_id}
 
 
 @router.get("/root-folder")
-def get_root_folder(user: User = Depends(get_current_user)):
+def get_root_folder(user: LeanUser = Depends(get_current_user_lean)):
     """Return the current root folder id if set."""
     return {"folder_id": user.drive_root_folder_id}
 
 
-def _list_files_impl(access_token: str, folder_id: str):
-    """Inner logic for list_files; may raise ScanLimitExceeded or requests.HTTPError."""
-    return collect_eligible_recursive(
+def _file_json(f: EligibleFile) -> dict:
+    """API shape of a listed file: Drive's field names, size as Drive's decimal string."""
+    return {
+        "id": f.id,
+        "name": f.name,
+        "mimeType": f.mime,
+        "size": str(f.size) if f.size is not None else None,
+    }
+
+
+async def _list_files_impl(http: httpx.AsyncClient, access_token: str, folder_id: str):
+    """Inner logic for list_files; may raise ScanLimitExceeded or httpx.HTTPStatusError."""
+    return await collect_eligible_recursive(
+        http,
         access_token,
         folder_id,
         max_size_bytes=MAX_ELIGIBLE_FILE_SIZE_BYTES,
@@ -95,9 +119,10 @@ def _list_files_impl(access_token: str, folder_id: str):
 
 
 @router.get("/files")
-def list_files(
+async def list_files(
     user: User = Depends(get_current_user),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
+    http: httpx.AsyncClient = Depends(get_http_client),
 ):
     """
     List all eligible books under the user's chosen root folder (and its
@@ -108,25 +133,26 @@ def list_files(
     if not user.drive_root_folder_id:
         return {"files": [], "message": "Set a root folder first (POST /drive/root-folder)"}
 
-    access_token = get_valid_access_token(user, db)
+    access_token = await get_valid_access_token(user, db, http)
     try:
-        files = _list_files_impl(access_token, user.drive_root_folder_id)
-    except RequestsHTTPError as e:
-        if getattr(e, "response", None) is not None and e.response.status_code == 401:
-            access_token = get_valid_access_token(user, db, force_refresh=True)
-            files = _list_files_impl(access_token, user.drive_root_folder_id)
+        files = await _list_files_impl(http, access_token, user.drive_root_folder_id)
+    except httpx.HTTPStatusError as e:
+        if e.response.status_code == 401:
+            access_token = await get_valid_access_token(user, db, http, force_refresh=True)
+            files = await _list_files_impl(http, access_token, user.drive_root_folder_id)
         else:
             raise
     except ScanLimitExceeded as e:
         raise HTTPException(status_code=400, detail=str(e.msg))
-    return {"files": files}
+    return {"files": [_file_json(f) for f in files]}
 
 
 @router.post("/download")
-def download_files(
+async def download_files(
     body: DownloadBody,
     user: User = Depends(get_current_user),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
+    http: httpx.AsyncClient = Depends(get_http_client),
 ):
     """
     Download the given Drive files to the user's storage namespace. Only files
@@ -148,53 +174,41 @@ def download_files(
             detail="Set a root folder first (POST /drive/root-folder)",
         )
 
-    access_token = get_valid_access_token(user, db)
+    access_token = await get_valid_access_token(user, db, http)
     try:
-        eligible = collect_eligible_recursive(
-            access_token,
-            user.drive_root_folder_id,
-            max_size_bytes=MAX_ELIGIBLE_FILE_SIZE_BYTES,
-        )
-    except RequestsHTTPError as e:
-        if getattr(e, "response", None) is not None and e.response.status_code == 401:
-            access_token = get_valid_access_token(user, db, force_refresh=True)
-            eligible = collect_eligible_recursive(
-                access_token,
-                user.drive_root_folder_id,
-                max_size_bytes=MAX_ELIGIBLE_FILE_SIZE_BYTES,
-            )
+        eligible = await _list_files_impl(http, access_token, user.drive_root_folder_id)
+    except httpx.HTTPStatusError as e:
+        if e.response.status_code == 401:
+            access_token = await get_valid_access_token(user, db, http, force_refresh=True)
+            eligible = await _list_files_impl(http, access_token, user.drive_root_folder_id)
         else:
             raise
     except ScanLimitExceeded as e:
         raise HTTPException(status_code=400, detail=str(e.msg))
 
-    allowed_ids = {f["id"] for f in eligible}
-    name_by_id = {f["id"]: f["name"] for f in eligible}
+    by_id = {f.id: f for f in eligible}
 
     for fid in body.file_ids:
-        if fid not in allowed_ids:
+        if fid not in by_id:
             raise HTTPException(
                 status_code=400,
                 detail=f"File {fid} is not an eligible file under your root folder",
             )
 
     raw_dir = user_storage_path(user.id, "drive", "raw")
-    downloaded: list[str] = []
-
-    for fid in body.file_ids:
-        name = name_by_id.get(fid, "unknown")
-        safe_name = safe_filename(name) or fid
-        dest_path = resolve_download_path(raw_dir, safe_name)
-
-        try:
-            basename = download_file_with_size_limit(
-                access_token,
-                fid,
-                dest_path,
-                max_bytes=MAX_ELIGIBLE_FILE_SIZE_BYTES,
-            )
-        except ValueError as e:
-            raise HTTPException(status_code=400, detail=str(e))
-        downloaded.append(basename)
+    items = [
+        (fid, safe_filename(by_id[fid].name or "unknown") or fid, by_id[fid].size)
+        for fid in body.file_ids
+    ]
+    try:
+        downloaded = await run_in_threadpool(
+            download_many,
+            access_token,
+            items,
+            raw_dir,
+            max_bytes=MAX_ELIGIBLE_FILE_SIZE_BYTES,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
     return {"downloaded": downloaded}
@@ -23,7 +23,8 @@ class User(Base):
     """
     __tablename__ = "users"
 
-    id = Column(String(255), primary_key=True, index=True)
+    # Primary key is indexed by the database; no extra index (see database.init_db)
+    id = Column(String(255), primary_key=True)
     email = Column(String(255), unique=True, nullable=False)
     name = Column(String(255))
 
@@ -4,23 +4,96 @@ JWT creation and verification for session management.
 Sessions are identified by a short-lived JWT stored in an HttpOnly cookie
 (set in auth router). Algorithm: HS256; secret must be set in config.
 Expiration matches JWT_COOKIE_MAX_AGE for coherence.
+
+Verified sessions are cached in-process (keyed by a hash of the token) as a
+detached SessionUser snapshot, so repeat requests skip JWT verification and the
+user lookup. Entries live at most SESSION_CACHE_TTL seconds and never past the
+token's own exp.
 """
+import hashlib
+import threading
+import time
+from dataclasses import dataclass
 from datetime import datetime, timedelta, UTC
 
+from cachetools import TTLCache
 from jose import jwt, JWTError
 
 from config import JWT_SECRET, JWT_ALGORITHM, JWT_COOKIE_MAX_AGE
 
 
-def create_jwt(user_id: str) -> str:
-    """Build a JWT for the given user id (Google sub); exp = now + JWT_COOKIE_MAX_AGE."""
+def create_jwt(user_id: str, email: str | None = None, name: str | None = None) -> str:
+    """
+    Build a JWT for the given user id (Google sub); exp = now + JWT_COOKIE_MAX_AGE.
+    email/name are carried as claims so profile reads need no DB lookup.
+    """
     payload = {
         "sub": user_id,
         "exp": datetime.now(UTC) + timedelta(seconds=JWT_COOKIE_MAX_AGE),
     }
+    if email:
+        payload["email"] = email
+        payload["name"] = name
     return jwt.encode(payload, JWT_SECRET, algorithm=JWT_ALGORITHM)
 
 
 def decode_jwt(token: str) -> dict:
     """Decode and verify JWT; raises JWTError if invalid or expired."""
     return jwt.decode(token, JWT_SECRET, algorithms=[JWT_ALGORITHM])
+
+
+def unverified_claims(token: str) -> dict:
+    """
+    Read a JWT's claims without verifying its signature. Only for tokens received
+    directly from Google over TLS (the id_token of the code exchange).
+    Raises JWTError if the token is malformed.
+    """
+    return jwt.get_unverified_claims(token)
+
+
+# --- Verified session cache ---
+
+SESSION_CACHE_TTL = 300  # seconds
+
+@dataclass(frozen=True)
+class SessionUser:
+    """Snapshot of the logged-in user's profile, detached from any DB session."""
+    id: str
+    email: str
+    name: str | None
+
+
+# token hash -> (SessionUser, expires_at epoch seconds); cachetools is not thread-safe
+_session_cache: TTLCache = TTLCache(maxsize=10_000, ttl=SESSION_CACHE_TTL)
+_session_cache_lock = threading.Lock()
+
+
+def _token_key(token: str) -> bytes:
+    return hashlib.blake2b(token.encode(), digest_size=16).digest()
+
+
+def get_cached_session(token: str) -> SessionUser | None:
+    """Return the cached SessionUser for a previously verified token, or None."""
+    key = _token_key(token)
+    with _session_cache_lock:
+        entry = _session_cache.get(key)
+        if entry is None:
+            return None
+        session, expires_at = entry
+        if time.time() >= expires_at:
+            del _session_cache[key]
+            return None
+    return session
+
+
+def cache_session(token: str, session: SessionUser, exp: float) -> None:
+    """Remember a verified token until min(exp, now + SESSION_CACHE_TTL)."""
+    expires_at = min(exp, time.time() + SESSION_CACHE_TTL)
+    with _session_cache_lock:
+        _session_cache[_token_key(token)] = (session, expires_at)
+
+
+def invalidate_session(token: str) -> None:
+    """Drop a token from the cache (e.g. on logout)."""
+    with _session_cache_lock:
+        _session_cache.pop(_token_key(token), None)
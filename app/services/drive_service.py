@@ -3,15 +3,34 @@ Drive service: Google Drive API integration, recursive scan, download.
 
 Business logic separated from HTTP layer. All Drive API calls use timeouts
 and respect config limits (scan folders/files, download count, stream size).
+Metadata calls (listing, folder validation) are async over the app's shared
+httpx.AsyncClient and the recursive scan lists several folders concurrently.
+Downloads stream from worker threads over one pooled requests.Session, several
+files at a time (download_many).
 """
+import asyncio
+import json
 import os
 import re
-from typing import Any
+import threading
+from collections import deque
+from concurrent.futures import FIRST_EXCEPTION, ThreadPoolExecutor, wait
+from email import policy as email_policy
+from email.parser import BytesParser
+from typing import Any, NamedTuple
+from urllib.parse import quote
 
+import httpx
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import HTTPError as Urllib3HTTPError
+from urllib3.util import Retry
 
 from config import (
+    DRIVE_DOWNLOAD_CHUNK_SIZE,
     DRIVE_DOWNLOAD_TIMEOUT,
+    DRIVE_DOWNLOAD_WORKERS,
+    DRIVE_SCAN_WORKERS,
     DRIVE_REQUEST_TIMEOUT,
     MAX_DOWNLOAD_FILES,
     MAX_ELIGIBLE_FILE_SIZE_BYTES,
@@ -29,46 +48,129 @@ ELIGIBLE_MIME_TYPES = {
 
 FOLDER_MIME = "application/vnd.google-apps.folder"
 
+_DRIVE_FILES_URL = "https://www.googleapis.com/drive/v3/files"
+_DRIVE_BATCH_URL = "https://www.googleapis.com/batch/drive/v3"
 
-def _drive_request(
+# safe_filename: path separators, reserved chars and all Unicode whitespace
+# (the highest whitespace code point is U+3000) map to "_"; runs then collapse
+_FN_TABLE = str.maketrans(
+    {c: "_" for c in '\\/:*?"<>|'}
+    | {chr(i): "_" for i in range(0x3001) if chr(i).isspace()}
+)
+_UNDERSCORE_RUN_RE = re.compile("_{2,}")
+
+# Shared HTTP session for file downloads (streamed from worker threads):
+# keep-alive and connection pooling, with bounded retries on transient 5xx.
+# No gzip opt-in here: media bodies (PDF/EPUB/DOCX) are already compressed.
+_SESSION = requests.Session()
+_SESSION.mount(
+    "https://",
+    HTTPAdapter(
+        pool_connections=32,
+        pool_maxsize=32,
+        max_retries=Retry(total=3, backoff_factor=0.3, status_forcelist=[500, 502, 503, 504]),
+    ),
+)
+
+# Metadata calls go through the app's shared httpx.AsyncClient, with the same
+# retry budget as _SESSION. Google only gzips responses when the User-Agent
+# contains "gzip"; httpx decompresses transparently.
+_DRIVE_HEADERS = {
+    "Accept-Encoding": "gzip",
+    "User-Agent": f"python-httpx/{httpx.__version__} audiobook-backend (gzip)",
+}
+_REQUEST_TIMEOUT = httpx.Timeout(DRIVE_REQUEST_TIMEOUT[1], connect=DRIVE_REQUEST_TIMEOUT[0])
+_DRIVE_RETRIES = 3
+_DRIVE_RETRY_STATUSES = frozenset({500, 502, 503, 504})
+
+# Drive batch endpoint: at most 100 calls per multipart/mixed request
+_BATCH_MAX_CALLS = 100
+_BATCH_BOUNDARY = "drive_batch_boundary"
+_BATCH_ITEM_RE = re.compile(r"item(\d+)>?\s*$")
+
+
+async def _drive_send(
+    http: httpx.AsyncClient,
     method: str,
     url: str,
     access_token: str,
     **kwargs: Any,
-) -> dict | list | None:
-    """Call Drive API with timeout; returns JSON. Raises on HTTP errors."""
-    headers = {"Authorization": f"Bearer {access_token}"}
+) -> httpx.Response:
+    """
+    Send a Drive API request with timeout and return the response. Raises
+    httpx.HTTPStatusError on HTTP errors. Connection errors and 5xx are retried
+    with exponential backoff.
+    """
+    headers = {**_DRIVE_HEADERS, "Authorization": f"Bearer {access_token}"}
     if "headers" in kwargs:
         headers.update(kwargs.pop("headers"))
-    kwargs.setdefault("timeout", DRIVE_REQUEST_TIMEOUT)
-    resp = requests.request(method, url, headers=headers, **kwargs)
+    kwargs.setdefault("timeout", _REQUEST_TIMEOUT)
+    for attempt in range(_DRIVE_RETRIES + 1):
+        try:
+            resp = await http.request(method, url, headers=headers, **kwargs)
+        except httpx.TransportError:
+            if attempt == _DRIVE_RETRIES:
+                raise
+        else:
+            if resp.status_code not in _DRIVE_RETRY_STATUSES or attempt == _DRIVE_RETRIES:
+                break
+        await asyncio.sleep(0.3 * 2**attempt)
     resp.raise_for_status()
+    return resp
+
+
+async def _drive_request(
+    http: httpx.AsyncClient,
+    method: str,
+    url: str,
+    access_token: str,
+    **kwargs: Any,
+) -> dict | list | None:
+    """Call Drive API via _drive_send; returns the JSON body (None if empty)."""
+    resp = await _drive_send(http, method, url, access_token, **kwargs)
     if resp.content:
         return resp.json()
     return None
 
 
-def _list_page(
+async def _list_page(
+    http: httpx.AsyncClient,
     access_token: str,
     parent_id: str,
     page_token: str | None = None,
 ) -> dict:
-    """List files and folders in a single Drive folder (one page)."""
+    """
+    List files and folders in a single Drive folder (one page). Pages are the
+    API maximum of 1000 entries (default is 100), folders first.
+    """
     params = {
         "q": f"'{parent_id}' in parents and trashed = false",
         "fields": "nextPageToken, files(id, name, mimeType, size)",
+        "pageSize": 1000,
+        "orderBy": "folder,name",
+        "corpora": "user",
+        "supportsAllDrives": "false",
     }
     if page_token:
         params["pageToken"] = page_token
-    data = _drive_request(
+    data = await _drive_request(
+        http,
         "GET",
-        "https://www.googleapis.com/drive/v3/files",
+        _DRIVE_FILES_URL,
         access_token,
         params=params,
     )
     return data or {"files": [], "nextPageToken": None}
 
 
+class EligibleFile(NamedTuple):
+    """An eligible book found by the scan; size in bytes (None if Drive omits it)."""
+    id: str
+    name: str
+    mime: str
+    size: int | None
+
+
 class ScanLimitExceeded(Exception):
     """Raised when recursive scan exceeds MAX_SCAN_FOLDERS or MAX_SCAN_FILES."""
 
@@ -77,92 +179,160 @@ class ScanLimitExceeded(Exception):
         super().__init__(msg)
 
 
-def collect_eligible_recursive(
+class DriveBatchError(Exception):
+    """Raised when a Drive batch response is malformed or misses requested items."""
+
+    def __init__(self, msg: str):
+        self.msg = msg
+        super().__init__(msg)
+
+
+async def _scan_folder(
+    http: httpx.AsyncClient,
     access_token: str,
     folder_id: str,
-    max_size_bytes: int = MAX_ELIGIBLE_FILE_SIZE_BYTES,
-) -> list[dict]:
+    max_size_bytes: int,
+) -> tuple[list[str], list[EligibleFile]]:
     """
-    Recursively list eligible files under folder_id. Respects MAX_SCAN_FOLDERS
-    and MAX_SCAN_FILES. Returns list of {id, name, mimeType, size}.
-    Raises ScanLimitExceeded if limits exceeded.
+    List every page of one folder. Returns (subfolder ids, eligible files).
+    Raises ScanLimitExceeded if the folder alone holds more than
+    MAX_SCAN_FILES eligible files.
     """
-    result: list[dict] = []
-    stack = [folder_id]
-    seen = {folder_id}
-    folders_processed = 0
-
-    while stack:
-        if folders_processed >= MAX_SCAN_FOLDERS:
-            raise ScanLimitExceeded(
-                f"Scan limit exceeded: max {MAX_SCAN_FOLDERS} folders"
-            )
-        if len(result) >= MAX_SCAN_FILES:
-            raise ScanLimitExceeded(
-                f"Scan limit exceeded: max {MAX_SCAN_FILES} eligible files"
-            )
+    subfolders: list[str] = []
+    files: list[EligibleFile] = []
+    page_token = None
 
-        parent_id = stack.pop()
-        folders_processed += 1
-        page_token = None
+    # Per-file loop: module globals and bound methods as locals (LOAD_FAST)
+    folder_mime = FOLDER_MIME
+    eligible_mimes = ELIGIBLE_MIME_TYPES
+    max_files = MAX_SCAN_FILES
+    max_size_len = len(str(max_size_bytes))
+    add_subfolder = subfolders.append
+    add_file = files.append
 
-        while True:
-            page = _list_page(access_token, parent_id, page_token)
-            for f in page.get("files", []):
-                fid = f.get("id")
-                if not fid:
+    while True:
+        page = await _list_page(http, access_token, folder_id, page_token)
+        for f in page.get("files", []):
+            get = f.get
+            fid = get("id")
+            if not fid:
+                continue
+            mime = get("mimeType") or ""
+            if mime == folder_mime:
+                add_subfolder(fid)
+                continue
+            if mime not in eligible_mimes:
+                continue
+            size_raw = get("size")
+            if size_raw is not None:
+                # Drive sends sizes as decimal strings: more digits than the
+                # limit means too large, no int() needed. Anything else falls
+                # through to the int() guard below.
+                if isinstance(size_raw, str) and len(size_raw) > max_size_len:
                     continue
-                mime = f.get("mimeType") or ""
-                if mime == FOLDER_MIME:
-                    if fid not in seen:
-                        seen.add(fid)
-                        stack.append(fid)
+                try:
+                    size_int = int(size_raw)
+                except (ValueError, TypeError):
                     continue
-                if mime not in ELIGIBLE_MIME_TYPES:
+                if size_int > max_size_bytes:
                     continue
-                size_raw = f.get("size")
-                if size_raw is not None:
-                    try:
-                        size_int = int(size_raw)
-                    except (ValueError, TypeError):
-                        continue
-                    if size_int > max_size_bytes:
-                        continue
-                    size = size_raw
-                else:
-                    size = None
+            else:
+                size_int = None
+
+            if len(files) >= max_files:
+                raise ScanLimitExceeded(
+                    f"Scan limit exceeded: max {max_files} eligible files"
+                )
+            add_file(EligibleFile(fid, get("name", "unknown"), mime, size_int))
+        page_token = page.get("nextPageToken")
+        if not page_token:
+            break
+
+    return subfolders, files
+
+
+async def collect_eligible_recursive(
+    http: httpx.AsyncClient,
+    access_token: str,
+    folder_id: str,
+    max_size_bytes: int = MAX_ELIGIBLE_FILE_SIZE_BYTES,
+) -> list[EligibleFile]:
+    """
+    Recursively list eligible files under folder_id. Respects MAX_SCAN_FOLDERS
+    and MAX_SCAN_FILES. Returns list of EligibleFile.
+    Raises ScanLimitExceeded if limits exceeded.
+
+    Up to DRIVE_SCAN_WORKERS folders are listed concurrently as tasks. Tasks only
+    fetch and filter; limits and the seen map are handled here in the
+    coordinating coroutine, so no locking is needed. On error or limit, running
+    tasks are cancelled.
 
-                if len(result) >= MAX_SCAN_FILES:
+    Tasks finish in any order, so each folder's files are kept under its
+    depth-first position and joined in that order at the end: a folder's files,
+    then each subfolder's (in Drive's folder,name order). The result is the
+    same on every call.
+    """
+    # Every folder ever queued, mapped to its depth-first position (the path of
+    # subfolder indexes from the root). Exact (not probabilistic) so no folder
+    # is skipped, and bounded by MAX_SCAN_FOLDERS. Its size is the folder count.
+    seen: dict[str, tuple[int, ...]] = {folder_id: ()}
+    found: list[tuple[tuple[int, ...], list[EligibleFile]]] = []
+    total_files = 0
+    queue = deque([folder_id])
+    running: dict[asyncio.Task, str] = {}
+
+    try:
+        while queue or running:
+            while queue and len(running) < DRIVE_SCAN_WORKERS:
+                fid = queue.popleft()
+                task = asyncio.create_task(
+                    _scan_folder(http, access_token, fid, max_size_bytes)
+                )
+                running[task] = fid
+            done, _ = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                position = seen[running.pop(task)]
+                subfolders, files = task.result()
+                total_files += len(files)
+                if total_files > MAX_SCAN_FILES:
                     raise ScanLimitExceeded(
                         f"Scan limit exceeded: max {MAX_SCAN_FILES} eligible files"
                     )
-                result.append({
-                    "id": fid,
-                    "name": f.get("name", "unknown"),
-                    "mimeType": mime,
-                    "size": size,
-                })
-            page_token = page.get("nextPageToken")
-            if not page_token:
-                break
+                found.append((position, files))
+                for index, fid in enumerate(subfolders):
+                    if fid in seen:
+                        continue
+                    if len(seen) >= MAX_SCAN_FOLDERS:
+                        raise ScanLimitExceeded(
+                            f"Scan limit exceeded: max {MAX_SCAN_FOLDERS} folders"
+                        )
+                    seen[fid] = position + (index,)
+                    queue.append(fid)
+    finally:
+        for task in running:
+            task.cancel()
+        if running:
+            await asyncio.gather(*running, return_exceptions=True)
 
-    return result
+    found.sort(key=lambda entry: entry[0])
+    return [f for _, files in found for f in files]
 
 
-def validate_folder(access_token: str, folder_id: str) -> bool:
+async def validate_folder(http: httpx.AsyncClient, access_token: str, folder_id: str) -> bool:
     """
     Verify folder_id exists, belongs to user's Drive, and is a folder.
     Returns True if valid; False if not found or not a folder; raises on other API errors.
     """
     try:
-        data = _drive_request(
+        data = await _drive_request(
+            http,
             "GET",
-            f"https://www.googleapis.com/drive/v3/files/{folder_id}",
+            _DRIVE_FILES_URL + "/" + folder_id,
             access_token,
             params={"fields": "id, mimeType"},
         )
-    except requests.exceptions.HTTPError as e:
-        if e.response is not None and e.response.status_code == 404:
+    except httpx.HTTPStatusError as e:
+        if e.response.status_code == 404:
             return False
         raise
     if not data:
@@ -171,72 +341,286 @@ def validate_folder(access_token: str, folder_id: str) -> bool:
     return mime == FOLDER_MIME
 
 
+async def validate_folders(
+    http: httpx.AsyncClient,
+    access_token: str,
+    folder_ids: list[str],
+) -> dict[str, bool]:
+    """
+    Bulk validate_folder: returns {folder_id: is_folder} in one round-trip per
+    _BATCH_MAX_CALLS ids, using Drive's multipart/mixed batch endpoint. Every
+    requested id gets an entry. Missing folders map to False; any other
+    per-item error is raised as httpx.HTTPStatusError (so a 401 triggers the
+    callers' token refresh). Raises DriveBatchError if the response is
+    malformed or lacks an answer for some id.
+    """
+    ids = list(dict.fromkeys(folder_ids))
+    result: dict[str, bool] = {}
+    for start in range(0, len(ids), _BATCH_MAX_CALLS):
+        chunk = ids[start:start + _BATCH_MAX_CALLS]
+        body = "".join(
+            f"--{_BATCH_BOUNDARY}\r\n"
+            "Content-Type: application/http\r\n"
+            f"Content-ID: <item{i}>\r\n\r\n"
+            f"GET /drive/v3/files/{quote(fid, safe='')}?fields=id%2CmimeType\r\n\r\n"
+            for i, fid in enumerate(chunk)
+        ) + f"--{_BATCH_BOUNDARY}--\r\n"
+        resp = await _drive_send(
+            http,
+            "POST",
+            _DRIVE_BATCH_URL,
+            access_token,
+            content=body.encode(),
+            headers={"Content-Type": f"multipart/mixed; boundary={_BATCH_BOUNDARY}"},
+        )
+        answered = set()
+        for i, status, data in _parse_batch_response(resp, len(chunk)):
+            fid = chunk[i]
+            answered.add(i)
+            if status == 404:
+                result[fid] = False
+            elif status >= 400:
+                raise httpx.HTTPStatusError(
+                    f"Batch item for folder {fid} failed with {status}",
+                    request=resp.request,
+                    response=httpx.Response(status, request=resp.request),
+                )
+            else:
+                result[fid] = isinstance(data, dict) and data.get("mimeType") == FOLDER_MIME
+        if len(answered) != len(chunk):
+            missing = [fid for i, fid in enumerate(chunk) if i not in answered]
+            raise DriveBatchError(f"Batch response has no answer for folders {missing}")
+    return result
+
+
+def _parse_batch_response(
+    resp: httpx.Response,
+    count: int,
+) -> list[tuple[int, int, dict | None]]:
+    """
+    Split a multipart/mixed batch response for count requests into
+    (item index, HTTP status, JSON body). Raises DriveBatchError on a missing
+    or non-multipart Content-Type, or on a part without a valid item
+    Content-ID, status line or JSON body.
+    """
+    content_type = resp.headers.get("content-type", "")
+    if not content_type.lower().startswith("multipart/"):
+        raise DriveBatchError(f"Batch response is not multipart (Content-Type {content_type!r})")
+    msg = BytesParser(policy=email_policy.HTTP).parsebytes(
+        b"Content-Type: " + content_type.encode() + b"\r\n\r\n" + resp.content
+    )
+    if not msg.is_multipart():
+        raise DriveBatchError("Batch response body is not a multipart message")
+    items = []
+    for part in msg.iter_parts():
+        # Google answers Content-ID <itemN> with <response-itemN>
+        content_id = part.get("Content-ID", "")
+        match = _BATCH_ITEM_RE.search(content_id)
+        if not match or int(match.group(1)) >= count:
+            raise DriveBatchError(f"Batch response part has unknown Content-ID {content_id!r}")
+        index = int(match.group(1))
+        head, _, payload = (part.get_payload(decode=True) or b"").partition(b"\r\n\r\n")
+        status_line = head.split(None, 2)
+        if len(status_line) < 2 or not status_line[1].isdigit():
+            raise DriveBatchError(f"Batch response part {content_id} has no HTTP status line")
+        try:
+            data = json.loads(payload) if payload.strip() else None
+        except ValueError:
+            raise DriveBatchError(f"Batch response part {content_id} has an invalid JSON body")
+        items.append((index, int(status_line[1]), data))
+    return items
+
+
 def safe_filename(name: str) -> str:
     """Remove path separators and reserved chars so name is safe for filesystem."""
-    safe = re.sub(r'[\\/:*?"<>|\s]+', "_", name)
+    safe = _UNDERSCORE_RUN_RE.sub("_", name.translate(_FN_TABLE))
     if len(safe) > 200:
         safe = safe[:200]
     return safe or "unnamed"
 
 
+# Storage dirs already created by this process; skips makedirs on repeat calls
+_CREATED_DIRS: set[str] = set()
+_CREATED_DIRS_LOCK = threading.Lock()
+
+
 def user_storage_path(user_id: str, *parts: str) -> str:
     """Build path under storage/users/user_<id>/...; create dirs if needed."""
     path = os.path.join(STORAGE_ROOT, "users", f"user_{user_id}", *parts)
-    os.makedirs(path, exist_ok=True)
+    if path in _CREATED_DIRS:
+        return path
+    with _CREATED_DIRS_LOCK:
+        os.makedirs(path, exist_ok=True)
+        _CREATED_DIRS.add(path)
     return path
 
 
+# O_BINARY only exists (and matters) on Windows
+_DOWNLOAD_OPEN_FLAGS = os.O_WRONLY | os.O_CREAT | os.O_TRUNC | getattr(os, "O_BINARY", 0)
+# Atomic name reservation in resolve_download_path: fails if the name exists
+_RESERVE_OPEN_FLAGS = os.O_WRONLY | os.O_CREAT | os.O_EXCL | getattr(os, "O_BINARY", 0)
+
+
 def download_file_with_size_limit(
     access_token: str,
     file_id: str,
     dest_path: str,
     max_bytes: int = MAX_ELIGIBLE_FILE_SIZE_BYTES,
+    expected_size: int | None = None,
+    auth_headers: dict[str, str] | None = None,
 ) -> str:
     """
     Stream file from Drive to dest_path. Aborts and deletes partial file
-    if content exceeds max_bytes. Returns final filename (may have _N suffix).
-    """
-    resp = requests.get(
-        f"https://www.googleapis.com/drive/v3/files/{file_id}",
-        headers={"Authorization": f"Bearer {access_token}"},
-        params={"alt": "media"},
-        stream=True,
-        timeout=DRIVE_DOWNLOAD_TIMEOUT,
-    )
-    resp.raise_for_status()
-
+    if content exceeds max_bytes; on any failure dest_path (including an empty
+    reservation from resolve_download_path) is removed. Returns final filename
+    (may have _N suffix).
+    expected_size (the size from the listing) is preallocated up front so the
+    filesystem can lay the file out contiguously; the file is trimmed to the
+    bytes actually received. auth_headers lets batch callers share one
+    Authorization header dict instead of building it per file.
+    """
+    resp = None
     total = 0
     try:
-        with open(dest_path, "wb") as f:
-            for chunk in resp.iter_content(chunk_size=8192):
+        resp = _SESSION.get(
+            _DRIVE_FILES_URL + "/" + file_id,
+            headers=auth_headers or {"Authorization": "Bearer " + access_token},
+            params={"alt": "media"},
+            stream=True,
+            timeout=DRIVE_DOWNLOAD_TIMEOUT,
+        )
+        resp.raise_for_status()
+
+        # Raw fd: each chunk is one write syscall, no BufferedWriter copy
+        fd = os.open(dest_path, _DOWNLOAD_OPEN_FLAGS, 0o644)
+        try:
+            if hasattr(os, "posix_fadvise"):
+                os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_SEQUENTIAL)
+            preallocated = bool(expected_size) and expected_size <= max_bytes
+            if preallocated:
+                try:
+                    if hasattr(os, "posix_fallocate"):
+                        os.posix_fallocate(fd, 0, expected_size)
+                    else:
+                        os.ftruncate(fd, expected_size)
+                except OSError:
+                    # Filesystem without preallocation support; stream as-is
+                    preallocated = False
+            # Straight from urllib3 (gunzipping if needed), skipping
+            # iter_content's generator and per-chunk bookkeeping
+            read = resp.raw.read
+            while True:
+                chunk = read(DRIVE_DOWNLOAD_CHUNK_SIZE, decode_content=True)
+                if not chunk:
+                    break
                 total += len(chunk)
                 if total > max_bytes:
-                    f.close()
-                    if os.path.exists(dest_path):
-                        os.remove(dest_path)
                     raise ValueError(
                         f"File exceeds max size ({max_bytes} bytes); "
                         f"aborted at {total} bytes"
                     )
-                f.write(chunk)
-    except (ValueError, IOError):
-        if os.path.exists(dest_path):
-            try:
-                os.remove(dest_path)
-            except OSError:
-                pass
+                view = memoryview(chunk)
+                while view:
+                    view = view[os.write(fd, view):]
+            if preallocated and total != expected_size:
+                os.ftruncate(fd, total)
+        finally:
+            os.close(fd)
+    except (ValueError, OSError, Urllib3HTTPError):
+        # requests' exceptions are OSError subclasses
+        _remove_quietly(dest_path)
         raise
+    finally:
+        if resp is not None:
+            resp.close()
     return os.path.basename(dest_path)
 
 
-def resolve_download_path(raw_dir: str, base_name: str) -> str:
-    """Return path for file; append _N if base_name already exists."""
-    path = os.path.join(raw_dir, base_name)
-    if not os.path.exists(path):
-        return path
+def _remove_quietly(path: str) -> None:
+    """Delete path if it exists; errors are ignored (best-effort cleanup)."""
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+def resolve_download_path(raw_dir: str, base_name: str, taken: set[str] | None = None) -> str:
+    """
+    Reserve a path for base_name in raw_dir, appending _N if the name is used,
+    and return it. The reservation is the file itself, created empty with
+    O_EXCL, so it holds against other threads and requests and on
+    case-insensitive filesystems. taken is a set of casefolded names known to be
+    used (the directory listing plus names reserved so far); it only lets
+    candidates be skipped without a syscall and is extended in place. When
+    omitted the directory is listed once.
+    """
+    if taken is None:
+        taken = {n.casefold() for n in os.listdir(raw_dir)}
     base, ext = os.path.splitext(base_name)
-    for i in range(1, 100):
-        path = os.path.join(raw_dir, f"{base}_{i}{ext}")
-        if not os.path.exists(path):
-            return path
-    return os.path.join(raw_dir, f"{base}_99{ext}")
+    i = 0
+    while True:
+        name = f"{base}_{i}{ext}" if i else base_name
+        i += 1
+        key = name.casefold()
+        if key in taken:
+            continue
+        taken.add(key)
+        path = os.path.join(raw_dir, name)
+        try:
+            os.close(os.open(path, _RESERVE_OPEN_FLAGS, 0o644))
+        except FileExistsError:
+            continue
+        return path
+
+
+def download_many(
+    access_token: str,
+    items: list[tuple[str, str, int | None]],
+    raw_dir: str,
+    max_bytes: int = MAX_ELIGIBLE_FILE_SIZE_BYTES,
+) -> list[str]:
+    """
+    Download (file_id, safe_name, expected_size) items into raw_dir
+    concurrently, at most DRIVE_DOWNLOAD_WORKERS at a time. Destination names
+    are reserved up front (see resolve_download_path) so parallel downloads
+    never collide. Returns final filenames in input order.
+
+    All or nothing: on the first failure, pending downloads are cancelled, the
+    ones in flight are allowed to finish, and every file of the batch is
+    removed before the failure (the first in input order) is re-raised. A
+    retried request therefore starts clean instead of adding _N copies.
+    """
+    taken = {n.casefold() for n in os.listdir(raw_dir)}
+    jobs = []
+    try:
+        for file_id, safe_name, expected_size in items:
+            dest_path = resolve_download_path(raw_dir, safe_name, taken)
+            jobs.append((file_id, dest_path, expected_size))
+    except BaseException:
+        for _, dest, _ in jobs:
+            _remove_quietly(dest)
+        raise
+
+    auth_headers = {"Authorization": "Bearer " + access_token}
+    workers = max(1, min(DRIVE_DOWNLOAD_WORKERS, len(jobs)))
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = [
+            pool.submit(
+                download_file_with_size_limit,
+                access_token, fid, dest, max_bytes, size, auth_headers,
+            )
+            for fid, dest, size in jobs
+        ]
+        _, not_done = wait(futures, return_when=FIRST_EXCEPTION)
+        for f in not_done:
+            f.cancel()
+    # Leaving the pool waited for in-flight downloads; every future is settled
+    errors = [f.exception() for f in futures if not f.cancelled() and f.exception()]
+    if not errors:
+        return [f.result() for f in futures]
+    # Failed downloads removed their own file; drop the completed and the
+    # never-started (reserved, empty) ones
+    for (_, dest, _), f in zip(jobs, futures):
+        if f.cancelled() or not f.exception():
+            _remove_quietly(dest)
+    raise errors[0]